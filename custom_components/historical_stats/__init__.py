@@ -1,6 +1,47 @@
 """Home Assistant custom integration for configurable historical statistics."""
 
-from .const import DOMAIN, PLATFORMS
+import voluptuous as vol
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+
+from .backfill import DATA_BACKFILL, async_setup_backfill
+from .const import (
+    CONF_MAX_CONCURRENT_QUERIES,
+    DEFAULT_MAX_CONCURRENT_QUERIES,
+    DOMAIN,
+    PLATFORMS,
+)
+from .query_queue import DATA_QUEUE, QueryQueue
+from .sensor import closed_results_store, sensor_unique_id
+from .stats import entry_source_id
+from .websocket_api import async_register_websocket_commands
+
+# Points are configured through the UI; YAML only holds integration-wide tuning
+CONFIG_SCHEMA = vol.Schema(
+    {
+        vol.Optional(DOMAIN): vol.Schema(
+            {
+                vol.Optional(
+                    CONF_MAX_CONCURRENT_QUERIES,
+                    default=DEFAULT_MAX_CONCURRENT_QUERIES,
+                ): vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+            }
+        )
+    },
+    extra=vol.ALLOW_EXTRA,
+)
+
+
+async def async_setup(hass, config):
+    """Set up the shared query queue, services and websocket commands."""
+    max_concurrency = config.get(DOMAIN, {}).get(
+        CONF_MAX_CONCURRENT_QUERIES, DEFAULT_MAX_CONCURRENT_QUERIES
+    )
+    queue = QueryQueue(hass, max_concurrency)
+    hass.data[DATA_QUEUE] = queue
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, queue.async_shutdown)
+    await async_setup_backfill(hass)
+    async_register_websocket_commands(hass)
+    return True
 
 
 async def async_setup_entry(hass, entry):
@@ -22,3 +63,10 @@ async def async_unload_entry(hass, entry):
     await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
     hass.data[DOMAIN].pop(entry.entry_id, None)
     return True
+
+
+async def async_remove_entry(hass, entry):
+    """Delete the stored results and backfill progress of a removed entry."""
+    unique_id = sensor_unique_id(entry_source_id(entry.data))
+    await closed_results_store(hass, unique_id).async_remove()
+    await hass.data[DATA_BACKFILL].async_remove_entry(entry)
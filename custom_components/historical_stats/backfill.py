@@ -0,0 +1,499 @@
+"""Backfill measurement points as external long-term statistics.
+
+A backfill evaluates one measurement point at every hour in the past and
+imports the resulting series with the recorder's external statistics API,
+so charts can read precomputed rows instead of recomputing the point.
+"""
+
+import asyncio
+import logging
+from collections import deque
+from datetime import timedelta
+
+import homeassistant.helpers.config_validation as cv
+import homeassistant.util.dt as dt_util
+import voluptuous as vol
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.const import ATTR_UNIT_OF_MEASUREMENT, UnitOfTime
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.storage import Store
+from homeassistant.util import slugify
+
+from .const import DOMAIN, SERVICE_BACKFILL
+from .queries import fetch_numeric_series, oldest_state_time
+from .query_queue import PRIORITY_BACKGROUND, async_run_query, query_priority
+from .stats import (
+    VALUE_AT_DELTA,
+    find_closest,
+    point_label,
+    point_threshold,
+    point_window,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+DATA_BACKFILL = f"{DOMAIN}_backfill"
+STORAGE_KEY = f"{DOMAIN}.backfill"
+STORAGE_VERSION = 1
+
+# Statistic types producing a numeric value that can be charted.
+BACKFILL_STAT_TYPES = {
+    "value_at",
+    "min",
+    "max",
+    "mean",
+    "time_weighted_mean",
+    "total",
+    "sum",
+    "time_above",
+    "time_below",
+    "crossings_above",
+    "crossings_below",
+}
+
+BACKFILL_SCHEMA = vol.Schema(
+    {
+        vol.Required("config_entry"): cv.string,
+        vol.Required("point"): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional("days", default=30): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=3650)
+        ),
+        vol.Optional("chunk_hours", default=168): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=24 * 31)
+        ),
+        vol.Optional("delay", default=1.0): vol.All(
+            vol.Coerce(float), vol.Range(min=0, max=3600)
+        ),
+        vol.Optional("restart", default=False): cv.boolean,
+    }
+)
+
+
+def backfill_statistic_id(entity_id, point):
+    """Return the external statistic id a point is backfilled into."""
+    return f"{DOMAIN}:{slugify(entity_id)}_{point_label(point)}"
+
+
+def backfill_unit(stat_type, source_unit):
+    """Return the unit of a point's values given the unit of its source."""
+    if stat_type in ("time_above", "time_below"):
+        return UnitOfTime.HOURS
+    if stat_type in ("crossings_above", "crossings_below"):
+        return None
+    return source_unit
+
+
+class WindowFolder:
+    """Evaluate a point at consecutive hours in one pass over its samples.
+
+    Window starts and ends only move forward from hour to hour. Running
+    totals of the held step function are taken at each of them, so the
+    statistics of a window are the difference of the totals at its end and
+    its start, and min and max come from monotonic queues of the spans
+    between them. Each sample is folded once however much the windows
+    overlap. As in the sensor, the value held at a window start counts as
+    its first sample.
+    """
+
+    def __init__(self, point, hours):
+        self._stat_type = point["stat_type"]
+        self._threshold = point_threshold(point)
+        self._windows = ((hour, *point_window(point, hour)) for hour in hours)
+        self._next = next(self._windows, None)
+        # Started windows as (hour, end, totals at their start)
+        self._open = deque()
+        # Extremes of the non-empty spans between edges, monotonic by value
+        self._span = 0
+        self._span_min = self._span_max = None
+        self._mins = deque()
+        self._maxs = deque()
+        self._first = None
+        self._last = None
+        self._count = 0
+        self._sum = 0.0
+        self._area = 0.0
+        self._seconds = 0.0
+        self._above = 0.0
+        self._below = 0.0
+        self._crossings_above = 0
+        self._crossings_below = 0
+        self._rows = []
+
+    @property
+    def next_hour(self):
+        """Return the first hour not evaluated yet, or None when done."""
+        if self._open:
+            return self._open[0][0]
+        return None if self._next is None else self._next[0]
+
+    def add(self, series):
+        """Fold chronologically ordered samples following the previous ones."""
+        threshold = self._threshold
+        for sample in series:
+            value, timestamp = sample
+            self._pass_edges(timestamp)
+            if self._last is None:
+                self._first = sample
+            else:
+                previous = self._last[0]
+                self._hold(timestamp)
+                if threshold is not None:
+                    if value > threshold >= previous:
+                        self._crossings_above += 1
+                    elif value < threshold <= previous:
+                        self._crossings_below += 1
+            self._last = sample
+            self._count += 1
+            self._sum += value
+            if self._span_min is None or value < self._span_min:
+                self._span_min = value
+            if self._span_max is None or value > self._span_max:
+                self._span_max = value
+
+    def advance(self, until):
+        """Evaluate the windows ending by ``until`` and return their rows.
+
+        Every sample recorded before ``until`` must have been added.
+        """
+        self._pass_edges(until)
+        rows, self._rows = self._rows, []
+        return rows
+
+    def _hold(self, until):
+        """Account for the last value being held until the given time."""
+        value, since = self._last
+        seconds = (until - since).total_seconds()
+        self._area += value * seconds
+        self._seconds += seconds
+        if self._threshold is not None:
+            if value > self._threshold:
+                self._above += seconds
+            elif value < self._threshold:
+                self._below += seconds
+        self._last = (value, until)
+
+    def _pass_edges(self, until):
+        """Start and evaluate the windows with an edge up to ``until``."""
+        while True:
+            edges = []
+            if self._next is not None:
+                edges.append(self._next[1])
+            if self._open:
+                edges.append(self._open[0][1])
+            if not edges or (edge := min(edges)) > until:
+                return
+
+            if self._last is not None:
+                self._hold(edge)
+            self._close_span()
+            totals = (
+                self._span,
+                None if self._last is None else self._last[0],
+                self._count,
+                self._sum,
+                self._area,
+                self._seconds,
+                self._above,
+                self._below,
+                self._crossings_above,
+                self._crossings_below,
+            )
+            while self._next is not None and self._next[1] == edge:
+                hour, _, end = self._next
+                self._open.append((hour, end, totals))
+                self._next = next(self._windows, None)
+            while self._open and self._open[0][1] == edge:
+                hour, _, start = self._open.popleft()
+                self._evaluate(hour, start, totals)
+
+    def _close_span(self):
+        """Queue the extremes of the span ending at the current edge."""
+        if self._span_min is not None:
+            while self._mins and self._mins[-1][1] >= self._span_min:
+                self._mins.pop()
+            self._mins.append((self._span, self._span_min))
+            while self._maxs and self._maxs[-1][1] <= self._span_max:
+                self._maxs.pop()
+            self._maxs.append((self._span, self._span_max))
+        self._span += 1
+        self._span_min = self._span_max = None
+
+    def _evaluate(self, hour, start, end):
+        """Add the row of the window between the totals start and end."""
+        span, held = start[0], start[1]
+        count = end[2] - start[2] + (held is not None)
+        # As in the sensor, a window of zero length has no value
+        if not count or span == end[0]:
+            return
+        while self._mins and self._mins[0][0] < span:
+            self._mins.popleft()
+        while self._maxs and self._maxs[0][0] < span:
+            self._maxs.popleft()
+        total = end[3] - start[3] + (held or 0.0)
+        last = end[1]
+
+        stat_type = self._stat_type
+        if stat_type in ("min", "max"):
+            queue = self._mins if stat_type == "min" else self._maxs
+            extremes = [] if held is None else [held]
+            if queue:
+                extremes.append(queue[0][1])
+            value = min(extremes) if stat_type == "min" else max(extremes)
+        elif stat_type == "mean":
+            value = total / count
+        elif stat_type == "sum":
+            value = total
+        elif stat_type == "total":
+            if count < 2:
+                return
+            # Without a held value the window starts at the first sample
+            value = last - (self._first[0] if held is None else held)
+        elif stat_type == "time_weighted_mean":
+            seconds = end[5] - start[5]
+            value = (end[4] - start[4]) / seconds if seconds > 0 else last
+        elif stat_type == "time_above":
+            value = (end[6] - start[6]) / 3600
+        elif stat_type == "time_below":
+            value = (end[7] - start[7]) / 3600
+        elif stat_type == "crossings_above":
+            value = end[8] - start[8]
+        else:
+            value = end[9] - start[9]
+        self._rows.append({"start": hour, "mean": value, "min": value, "max": value})
+
+
+class ValueAtFolder:
+    """Look up a value_at point at consecutive hours in one pass.
+
+    The value recorded closest to each target within VALUE_AT_DELTA is used,
+    falling back to the value in effect at the target, as in the sensor.
+    """
+
+    def __init__(self, point, hours):
+        self._targets = ((hour, point_window(point, hour)[0]) for hour in hours)
+        self._next = next(self._targets, None)
+        self._samples = deque()
+        self._rows = []
+
+    @property
+    def next_hour(self):
+        """Return the first hour not evaluated yet, or None when done."""
+        return None if self._next is None else self._next[0]
+
+    def add(self, series):
+        """Fold chronologically ordered samples following the previous ones."""
+        for sample in series:
+            self._evaluate(sample[1])
+            self._samples.append(sample)
+
+    def advance(self, until):
+        """Evaluate the targets resolved by ``until`` and return their rows.
+
+        Every sample recorded before ``until`` must have been added.
+        """
+        self._evaluate(until)
+        rows, self._rows = self._rows, []
+        return rows
+
+    def _evaluate(self, until):
+        """Resolve the targets whose lookup interval ends by ``until``."""
+        samples = self._samples
+        while self._next is not None:
+            hour, target = self._next
+            low, high = target - VALUE_AT_DELTA, target + VALUE_AT_DELTA
+            if high > until:
+                return
+            self._next = next(self._targets, None)
+            # Keep the last sample before the interval as the held value
+            while len(samples) > 1 and samples[1][1] < low:
+                samples.popleft()
+            found = find_closest(
+                [sample for sample in samples if low <= sample[1] < high], target
+            )
+            if found is None:
+                if not samples or samples[0][1] >= low:
+                    continue
+                found = samples[0]
+            value = found[0]
+            self._rows.append(
+                {"start": hour, "mean": value, "min": value, "max": value}
+            )
+
+class BackfillManager:
+    """Run resumable, rate-limited backfills and remember their progress."""
+
+    def __init__(self, hass):
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        # Maps statistic id to the isoformat hour the next chunk starts at
+        self._progress = None
+        self._tasks = {}
+
+    async def async_handle_service(self, call):
+        """Validate a backfill service call and start the job."""
+        entry = self.hass.config_entries.async_get_entry(call.data["config_entry"])
+        if entry is None or entry.domain != DOMAIN:
+            raise HomeAssistantError("Unknown historical statistics config entry")
+
+        points = entry.options.get("points", [])
+        index = call.data["point"]
+        if index > len(points):
+            raise HomeAssistantError(f"Config entry has no measurement point {index}")
+        point = points[index - 1]
+        if point["stat_type"] not in BACKFILL_STAT_TYPES:
+            raise HomeAssistantError(
+                f"Statistic type {point['stat_type']} cannot be backfilled"
+            )
+        if point.get("time_unit") == "all" or point.get("time_unit_to") == "all":
+            raise HomeAssistantError("Points covering all history cannot be backfilled")
+
+        if "entity_ids" in entry.data:
+            raise HomeAssistantError("Group entries cannot be backfilled")
+        entity_id = entry.data["entity_id"]
+        statistic_id = backfill_statistic_id(entity_id, point)
+        task = self._tasks.get(statistic_id)
+        if task is not None and not task.done():
+            raise HomeAssistantError(f"Backfill of {statistic_id} is already running")
+
+        if self._progress is None:
+            self._progress = await self._store.async_load() or {}
+        if call.data["restart"]:
+            self._progress.pop(statistic_id, None)
+
+        end = dt_util.utcnow().replace(minute=0, second=0, microsecond=0)
+        start = end - timedelta(days=call.data["days"])
+        if (resume := self._progress.get(statistic_id)) is not None:
+            start = max(start, dt_util.parse_datetime(resume))
+        if start >= end:
+            _LOGGER.info("Backfill of %s is already up to date", statistic_id)
+            return
+
+        state = self.hass.states.get(entity_id)
+        friendly_name = entry.data.get("friendly_name") or (
+            state.name if state else entity_id
+        )
+        metadata = {
+            "has_mean": True,
+            "has_sum": False,
+            "name": f"{friendly_name} {point_label(point)}",
+            "source": DOMAIN,
+            "statistic_id": statistic_id,
+            "unit_of_measurement": backfill_unit(
+                point["stat_type"],
+                state.attributes.get(ATTR_UNIT_OF_MEASUREMENT) if state else None,
+            ),
+        }
+
+        self._tasks[statistic_id] = self.hass.async_create_background_task(
+            self._async_backfill(
+                metadata,
+                entity_id,
+                point,
+                start,
+                end,
+                timedelta(hours=call.data["chunk_hours"]),
+                call.data["delay"],
+            ),
+            f"{DOMAIN} backfill {statistic_id}",
+        )
+
+    async def async_remove_entry(self, entry):
+        """Stop the backfills of a removed entry and forget their progress."""
+        if "entity_ids" in entry.data:
+            return
+        statistic_ids = {
+            backfill_statistic_id(entry.data["entity_id"], point)
+            for point in entry.options.get("points", [])
+        }
+        for statistic_id in statistic_ids:
+            if (task := self._tasks.pop(statistic_id, None)) is not None:
+                task.cancel()
+
+        if self._progress is None:
+            self._progress = await self._store.async_load() or {}
+        if statistic_ids & self._progress.keys():
+            for statistic_id in statistic_ids:
+                self._progress.pop(statistic_id, None)
+            self._store.async_delay_save(lambda: self._progress, 1)
+
+    async def _async_backfill(
+        self, metadata, entity_id, point, start, end, chunk, delay
+    ):
+        """Compute and import a point chunk by chunk, saving progress as it goes.
+
+        History is read forward once, ``chunk`` at a time, and folded into
+        the windows of all hours as it arrives, so overlapping windows do not
+        read or fold the same states again.
+        """
+        statistic_id = metadata["statistic_id"]
+        _LOGGER.info("Backfilling %s from %s to %s", statistic_id, start, end)
+        hours = []
+        hour = start
+        while hour < end:
+            hours.append(hour)
+            hour += timedelta(hours=1)
+
+        if point["stat_type"] == "value_at":
+            folder = ValueAtFolder(point, hours)
+            fetch_start = point_window(point, hours[0])[0] - VALUE_AT_DELTA
+            fetch_end = point_window(point, hours[-1])[0] + VALUE_AT_DELTA
+        else:
+            folder = WindowFolder(point, hours)
+            fetch_start = point_window(point, hours[0])[0]
+            fetch_end = point_window(point, hours[-1])[1]
+
+        # Nothing can be read before the oldest recorded state
+        oldest = await async_run_query(
+            self.hass,
+            query_priority(PRIORITY_BACKGROUND, fetch_start, fetch_end),
+            oldest_state_time,
+            self.hass,
+            [entity_id],
+        )
+        cursor = fetch_end if oldest is None else max(fetch_start, oldest)
+        first = cursor
+
+        while cursor < fetch_end:
+            chunk_end = min(cursor + chunk, fetch_end)
+            series = await async_run_query(
+                self.hass,
+                query_priority(PRIORITY_BACKGROUND, cursor, chunk_end),
+                fetch_numeric_series,
+                self.hass,
+                entity_id,
+                cursor,
+                chunk_end,
+                point.get("source_attribute"),
+                # Only the first chunk needs the state valid at its start
+                cursor == first,
+            )
+            folder.add(series)
+            self._import(metadata, folder.advance(chunk_end), folder.next_hour)
+            cursor = chunk_end
+
+            # Leave room for other recorder work between chunks
+            if cursor < fetch_end:
+                await asyncio.sleep(delay)
+
+        self._import(metadata, folder.advance(fetch_end), end)
+        _LOGGER.info("Backfill of %s finished", statistic_id)
+
+    def _import(self, metadata, rows, resume):
+        """Import computed rows and remember the hour to resume at."""
+        if rows:
+            async_add_external_statistics(self.hass, metadata, rows)
+        if resume is not None:
+            self._progress[metadata["statistic_id"]] = resume.isoformat()
+            self._store.async_delay_save(lambda: self._progress, 1)
+
+
+async def async_setup_backfill(hass):
+    """Register the backfill service."""
+    manager = BackfillManager(hass)
+    hass.data[DATA_BACKFILL] = manager
+    hass.services.async_register(
+        DOMAIN,
+        SERVICE_BACKFILL,
+        manager.async_handle_service,
+        schema=BACKFILL_SCHEMA,
+    )
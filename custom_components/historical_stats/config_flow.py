@@ -10,9 +10,73 @@ from homeassistant.helpers.selector import (
 from homeassistant.helpers import translation
 
 from .const import DOMAIN
+from .cost import async_estimate_cost, can_use_statistics, cost_placeholders
+from .downsample import MAX_SERIES_POINTS, SERIES_METHODS
+from .stats import (
+    CALENDAR_UNITS,
+    GROUP_AGGREGATES,
+    THRESHOLD_STAT_TYPES,
+    entry_entity_ids,
+    group_id,
+)
 
 # Available statistic types
-STAT_TYPES = ["value_at", "min", "max", "mean", "total", "sum"]
+STAT_TYPES = [
+    "value_at",
+    "value_at_series",
+    "min",
+    "max",
+    "mean",
+    "time_weighted_mean",
+    "total",
+    "sum",
+    "time_above",
+    "time_below",
+    "crossings_above",
+    "crossings_below",
+]
+
+# Sparkline size, bounded so a series stays small
+SERIES_POINTS_SELECTOR = NumberSelector(
+    {"min": 0, "max": MAX_SERIES_POINTS, "step": 1, "mode": "box"}
+)
+
+
+def _point_errors(stat_types, user_input):
+    """Return form errors for a submitted measurement point."""
+    errors = {}
+    if user_input.get("threshold") is None and any(
+        stat_type in THRESHOLD_STAT_TYPES for stat_type in stat_types
+    ):
+        errors["threshold"] = "threshold_required"
+    # The unit is the offset between lookups, so it needs a fixed length
+    if "value_at_series" in stat_types and (
+        user_input.get("time_unit") == "all"
+        or user_input.get("time_unit") in CALENDAR_UNITS
+    ):
+        errors["time_unit"] = "offset_unit_required"
+    return errors
+
+
+def _cost_schema(points, aggregate=None):
+    """Return the cost step schema, offering statistics where they apply."""
+    if any(can_use_statistics(point, aggregate) for point in points):
+        return vol.Schema({vol.Optional("use_statistics", default=True): bool})
+    return vol.Schema({})
+
+
+def _with_statistics(points, use_statistics, aggregate=None):
+    """Return points, switched to long-term statistics where requested."""
+    if not use_statistics:
+        return points
+    return [
+        (
+            {**point, "use_statistics": True}
+            if can_use_statistics(point, aggregate)
+            else point
+        )
+        for point in points
+    ]
 
 
 class HistoricalStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
@@ -21,8 +85,14 @@ class HistoricalStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
     def __init__(self):
         self.data = {}
         self.measure_points = []
+        # Points of the last submitted form, kept while showing the cost step
+        self._pending_points = []
+        self._add_another = False
+        self._cost = None
         self.stat_type_labels = {}
         self.time_units = {}
+        self.series_methods = {}
+        self.group_aggregates = {}
         self._translations_loaded = False
 
     async def _async_setup_translations(self):
@@ -30,21 +100,37 @@ class HistoricalStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
         if self._translations_loaded:
             return
         lang = self.hass.config.language
+        group_aggregate_strings = await translation.async_get_translations(
+            self.hass, lang, "group_aggregate", integrations=[DOMAIN]
+        )
         stat_type_strings = await translation.async_get_translations(
             self.hass, lang, "stat_type", integrations=[DOMAIN]
         )
         time_unit_strings = await translation.async_get_translations(
             self.hass, lang, "time_unit", integrations=[DOMAIN]
         )
+        series_method_strings = await translation.async_get_translations(
+            self.hass, lang, "series_method", integrations=[DOMAIN]
+        )
         self.stat_type_labels = {
             key.split(".")[-1]: value for key, value in stat_type_strings.items()
         }
         self.time_units = {
             key.split(".")[-1]: value for key, value in time_unit_strings.items()
         }
+        self.series_methods = {
+            key.split(".")[-1]: value for key, value in series_method_strings.items()
+        }
+        self.group_aggregates = {
+            key.split(".")[-1]: value for key, value in group_aggregate_strings.items()
+        }
         self._translations_loaded = True
 
     async def async_step_user(self, user_input=None):
+        """Choose between statistics of one entity or of a group."""
+        return self.async_show_menu(step_id="user", menu_options=["entity", "group"])
+
+    async def async_step_entity(self, user_input=None):
         errors = {}
         if user_input is not None:
             # Unique per entity
@@ -53,7 +139,7 @@ class HistoricalStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             self.data = user_input
             return await self.async_step_add_point()
         return self.async_show_form(
-            step_id="user",
+            step_id="entity",
             data_schema=vol.Schema(
                 {
                     vol.Required("entity_id"): EntitySelector({"multiple": False}),
@@ -66,40 +152,87 @@ class HistoricalStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_group(self, user_input=None):
+        """Configure statistics of an aggregate over several entities."""
+        errors = {}
+        await self._async_setup_translations()
+        if user_input is not None:
+            entity_ids = sorted(set(user_input["entity_ids"]))
+            if len(entity_ids) < 2:
+                errors["entity_ids"] = "group_too_small"
+            else:
+                # Unique per set of entities and aggregate
+                await self.async_set_unique_id(
+                    group_id(entity_ids, user_input["aggregate"])
+                )
+                self._abort_if_unique_id_configured()
+                self.data = {**user_input, "entity_ids": entity_ids}
+                return await self.async_step_add_point()
+        return self.async_show_form(
+            step_id="group",
+            data_schema=vol.Schema(
+                {
+                    vol.Required("entity_ids"): EntitySelector({"multiple": True}),
+                    vol.Required("aggregate", default="sum"): SelectSelector(
+                        {
+                            "options": [
+                                {"value": v, "label": self.group_aggregates[v]}
+                                for v in GROUP_AGGREGATES
+                            ],
+                            "mode": "dropdown",
+                        }
+                    ),
+                    vol.Optional("update_interval", default=30): NumberSelector(
+                        {"min": 1, "max": 1440, "unit_of_measurement": "min"}
+                    ),
+                    vol.Required("friendly_name"): str,
+                }
+            ),
+            errors=errors,
+        )
+
     async def async_step_add_point(self, user_input=None):
         """Add a new measurement point, allowing multiselect for stat_types."""
         errors = {}
         await self._async_setup_translations()
         if user_input is not None:
+            errors = _point_errors(user_input["stat_types"], user_input)
+        if user_input is not None and not errors:
             selected_types = user_input["stat_types"]
             time_unit = user_input["time_unit"]
             time_value = user_input.get("time_value", 1)
             time_unit_to = user_input.get("time_unit_to")
             time_value_to = user_input.get("time_value_to")
+            source_attribute = user_input.get("source_attribute")
+            threshold = user_input.get("threshold")
+            series_points = user_input.get("series_points")
+            series_method = user_input.get("series_method")
 
-            for stat_type in selected_types:
-                self.measure_points.append(
-                    {
-                        "stat_type": stat_type,
-                        "time_unit": time_unit,
-                        "time_value": time_value,
-                        "time_unit_to": time_unit_to,
-                        "time_value_to": time_value_to,
-                    }
-                )
-            if user_input.get("add_another", False):
-                return await self.async_step_add_point()
-            entry_data = dict(self.data)
-            entry_options = {"points": self.measure_points}
-            friendly_name = entry_data.get("friendly_name")
-            if not friendly_name:
-                state = self.hass.states.get(entry_data["entity_id"])
-                friendly_name = state.name if state else entry_data["entity_id"]
-            return self.async_create_entry(
-                title=f"Historical statistics: {friendly_name}",
-                data=entry_data,
-                options=entry_options,
+            self._pending_points = [
+                {
+                    "stat_type": stat_type,
+                    "time_unit": time_unit,
+                    "time_value": time_value,
+                    "time_unit_to": time_unit_to,
+                    "time_value_to": time_value_to,
+                    "source_attribute": source_attribute,
+                    "threshold": threshold,
+                    "series_points": series_points,
+                    "series_method": series_method,
+                }
+                for stat_type in selected_types
+            ]
+            self._add_another = user_input.get("add_another", False)
+            self._cost = await async_estimate_cost(
+                self.hass,
+                entry_entity_ids(self.data),
+                self._pending_points,
+                self.data.get("update_interval"),
+                self.data.get("aggregate"),
             )
+            if self._cost and self._cost["expensive"]:
+                return await self.async_step_cost()
+            return await self._async_add_pending_points()
 
         # Use SelectSelector for proper multi-select in the HA UI
         return self.async_show_form(
@@ -131,11 +264,26 @@ class HistoricalStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
                             "options": [
                                 {"value": v, "label": self.time_units[v]}
                                 for v in self.time_units
+                                if v not in CALENDAR_UNITS
                             ],
                             "mode": "dropdown",
                         }
                     ),
                     vol.Optional("time_value_to", default=0): int,
+                    vol.Optional("source_attribute"): str,
+                    vol.Optional("threshold"): NumberSelector(
+                        {"mode": "box", "step": "any"}
+                    ),
+                    vol.Optional("series_points", default=0): SERIES_POINTS_SELECTOR,
+                    vol.Optional("series_method", default="lttb"): SelectSelector(
+                        {
+                            "options": [
+                                {"value": v, "label": self.series_methods[v]}
+                                for v in SERIES_METHODS
+                            ],
+                            "mode": "dropdown",
+                        }
+                    ),
                     vol.Optional("add_another", default=False): bool,
                 }
             ),
@@ -145,6 +293,40 @@ class HistoricalStatsConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    async def async_step_cost(self, user_input=None):
+        """Warn about an expensive point and offer cheaper alternatives."""
+        if user_input is not None:
+            return await self._async_add_pending_points(
+                user_input.get("use_statistics", False)
+            )
+        return self.async_show_form(
+            step_id="cost",
+            data_schema=_cost_schema(self._pending_points, self.data.get("aggregate")),
+            description_placeholders=cost_placeholders(self._cost),
+        )
+
+    async def _async_add_pending_points(self, use_statistics=False):
+        """Store the submitted points and continue or finish the flow."""
+        self.measure_points.extend(
+            _with_statistics(
+                self._pending_points, use_statistics, self.data.get("aggregate")
+            )
+        )
+        self._pending_points = []
+        if self._add_another:
+            return await self.async_step_add_point()
+        entry_data = dict(self.data)
+        entry_options = {"points": self.measure_points}
+        friendly_name = entry_data.get("friendly_name")
+        if not friendly_name:
+            state = self.hass.states.get(entry_data["entity_id"])
+            friendly_name = state.name if state else entry_data["entity_id"]
+        return self.async_create_entry(
+            title=f"Historical statistics: {friendly_name}",
+            data=entry_data,
+            options=entry_options,
+        )
+
     @staticmethod
     def async_get_options_flow(config_entry):
         return HistoricalStatsOptionsFlow(config_entry)
@@ -157,8 +339,11 @@ class HistoricalStatsOptionsFlow(config_entries.OptionsFlow):
         self.points = list(config_entry.options.get("points", []))
         self._current_step = "init"
         self._edit_index = None
+        self._pending_points = []
+        self._cost = None
         self.stat_type_labels = {}
         self.time_units = {}
+        self.series_methods = {}
         self._translations_loaded = False
 
     async def _async_setup_translations(self):
@@ -172,12 +357,18 @@ class HistoricalStatsOptionsFlow(config_entries.OptionsFlow):
         time_unit_strings = await translation.async_get_translations(
             self.config_entry.hass, lang, "time_unit", integrations=[DOMAIN]
         )
+        series_method_strings = await translation.async_get_translations(
+            self.config_entry.hass, lang, "series_method", integrations=[DOMAIN]
+        )
         self.stat_type_labels = {
             key.split(".")[-1]: value for key, value in stat_type_strings.items()
         }
         self.time_units = {
             key.split(".")[-1]: value for key, value in time_unit_strings.items()
         }
+        self.series_methods = {
+            key.split(".")[-1]: value for key, value in series_method_strings.items()
+        }
         self._translations_loaded = True
 
     async def async_step_init(self, user_input=None):
@@ -186,6 +377,11 @@ class HistoricalStatsOptionsFlow(config_entries.OptionsFlow):
         await self._async_setup_translations()
         point_labels = [
             f"{i + 1}: {point['stat_type']} {point.get('time_value', '')} {point.get('time_unit', '')}"
+            + (
+                f" ({point['source_attribute']})"
+                if point.get("source_attribute")
+                else ""
+            )
             for i, point in enumerate(self.points)
         ]
         choices = [
@@ -248,8 +444,9 @@ class HistoricalStatsOptionsFlow(config_entries.OptionsFlow):
         errors = {}
         await self._async_setup_translations()
         if user_input is not None:
-            self.points.append(user_input)
-            return await self.async_step_init()
+            errors = _point_errors([user_input["stat_type"]], user_input)
+            if not errors:
+                return await self._async_check_cost(user_input)
         return self.async_show_form(
             step_id="add_point",
             data_schema=vol.Schema(
@@ -278,25 +475,83 @@ class HistoricalStatsOptionsFlow(config_entries.OptionsFlow):
                             "options": [
                                 {"value": v, "label": self.time_units[v]}
                                 for v in self.time_units
+                                if v not in CALENDAR_UNITS
                             ],
                             "mode": "dropdown",
                         }
                     ),
                     vol.Optional("time_value_to", default=0): int,
+                    vol.Optional("source_attribute"): str,
+                    vol.Optional("threshold"): NumberSelector(
+                        {"mode": "box", "step": "any"}
+                    ),
+                    vol.Optional("series_points", default=0): SERIES_POINTS_SELECTOR,
+                    vol.Optional("series_method", default="lttb"): SelectSelector(
+                        {
+                            "options": [
+                                {"value": v, "label": self.series_methods[v]}
+                                for v in SERIES_METHODS
+                            ],
+                            "mode": "dropdown",
+                        }
+                    ),
                 }
             ),
             errors=errors,
         )
 
+    async def _async_check_cost(self, point):
+        """Show the cost step for an expensive point, otherwise store it."""
+        self._pending_points = [point]
+        self._cost = await async_estimate_cost(
+            self.config_entry.hass,
+            entry_entity_ids(self.config_entry.data),
+            self._pending_points,
+            self.config_entry.data.get("update_interval"),
+            self.config_entry.data.get("aggregate"),
+        )
+        if self._cost and self._cost["expensive"]:
+            return await self.async_step_cost()
+        return await self._async_store_pending_point()
+
+    async def async_step_cost(self, user_input=None):
+        """Warn about an expensive point and offer cheaper alternatives."""
+        if user_input is not None:
+            return await self._async_store_pending_point(
+                user_input.get("use_statistics", False)
+            )
+        return self.async_show_form(
+            step_id="cost",
+            data_schema=_cost_schema(
+                self._pending_points, self.config_entry.data.get("aggregate")
+            ),
+            description_placeholders=cost_placeholders(self._cost),
+        )
+
+    async def _async_store_pending_point(self, use_statistics=False):
+        """Add or replace the submitted point and return to the overview."""
+        (point,) = _with_statistics(
+            self._pending_points,
+            use_statistics,
+            self.config_entry.data.get("aggregate"),
+        )
+        self._pending_points = []
+        if self._edit_index is not None:
+            self.points[self._edit_index] = point
+            self._edit_index = None
+        else:
+            self.points.append(point)
+        return await self.async_step_init()
+
     async def async_step_edit_point(self, user_input=None):
         """Edit an existing measurement point."""
         errors = {}
         await self._async_setup_translations()
         point = self.points[self._edit_index]
         if user_input is not None:
-            self.points[self._edit_index] = user_input
-            self._edit_index = None
-            return await self.async_step_init()
+            errors = _point_errors([user_input["stat_type"]], user_input)
+            if not errors:
+                return await self._async_check_cost(user_input)
         return self.async_show_form(
             step_id="edit_point",
             data_schema=vol.Schema(
@@ -329,6 +584,7 @@ class HistoricalStatsOptionsFlow(config_entries.OptionsFlow):
                             "options": [
                                 {"value": v, "label": self.time_units[v]}
                                 for v in self.time_units
+                                if v not in CALENDAR_UNITS
                             ],
                             "mode": "dropdown",
                         }
@@ -336,6 +592,31 @@ class HistoricalStatsOptionsFlow(config_entries.OptionsFlow):
                     vol.Optional(
                         "time_value_to", default=point.get("time_value_to", 0)
                     ): int,
+                    vol.Optional(
+                        "source_attribute",
+                        description={
+                            "suggested_value": point.get("source_attribute")
+                        },
+                    ): str,
+                    vol.Optional(
+                        "threshold",
+                        description={"suggested_value": point.get("threshold")},
+                    ): NumberSelector({"mode": "box", "step": "any"}),
+                    vol.Optional(
+                        "series_points", default=point.get("series_points") or 0
+                    ): SERIES_POINTS_SELECTOR,
+                    vol.Optional(
+                        "series_method",
+                        default=point.get("series_method") or "lttb",
+                    ): SelectSelector(
+                        {
+                            "options": [
+                                {"value": v, "label": self.series_methods[v]}
+                                for v in SERIES_METHODS
+                            ],
+                            "mode": "dropdown",
+                        }
+                    ),
                 }
             ),
             errors=errors,
@@ -4,3 +4,8 @@ PLATFORMS = ["sensor"]
 STATE_OK = "OK"
 STATE_NO_DATA = "NO_DATA"
 STATE_ERROR = "ERROR"
+
+SERVICE_BACKFILL = "backfill"
+
+CONF_MAX_CONCURRENT_QUERIES = "max_concurrent_queries"
+DEFAULT_MAX_CONCURRENT_QUERIES = 2
@@ -0,0 +1,103 @@
+"""Estimate how expensive measurement points are to keep up to date."""
+
+import logging
+import math
+
+import homeassistant.util.dt as dt_util
+
+from .queries import count_states
+from .query_queue import PRIORITY_USER, async_run_query, query_priority
+from .stats import (
+    GROUP_STATISTICS,
+    LOOKUP_STAT_TYPES,
+    STATISTICS_STAT_TYPES,
+    is_closed_period,
+    point_window,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+# Recorder rows an entry may read per day before the user is warned
+DAILY_ROW_BUDGET = 5_000_000
+
+MINUTES_PER_DAY = 24 * 60
+
+
+async def async_estimate_cost(
+    hass, entity_ids, points, update_interval, aggregate=None
+):
+    """Return the expected recorder load of measurement points.
+
+    Points sharing a window and source attribute are computed from one read,
+    so each distinct read is counted once. The result holds the rows read per
+    update and per day, whether that exceeds DAILY_ROW_BUDGET and the update
+    interval that would fit the budget. None is returned when the points
+    are cheap by nature or the row count could not be determined.
+    """
+    now = dt_util.utcnow()
+    reads = set()
+    for point in points:
+        # Lookups around single moments are always cheap, closed periods are
+        # read once per period and statistics points read no states at all
+        if (
+            point["stat_type"] in LOOKUP_STAT_TYPES
+            or is_closed_period(point)
+            or (point.get("use_statistics") and can_use_statistics(point, aggregate))
+        ):
+            continue
+        start, end = point_window(point, now)
+        reads.add((start, end, point.get("source_attribute") or None))
+    if not reads:
+        return None
+
+    rows_per_update = 0
+    try:
+        for start, end, _ in reads:
+            rows_per_update += await async_run_query(
+                hass,
+                query_priority(PRIORITY_USER, start, end),
+                count_states,
+                hass,
+                entity_ids,
+                start,
+                end,
+            )
+    except Exception:
+        _LOGGER.debug("Could not estimate row count for %s", entity_ids, exc_info=True)
+        return None
+
+    update_interval = int(update_interval or 30)
+    per_day = rows_per_update * MINUTES_PER_DAY // update_interval
+    return {
+        "rows": rows_per_update,
+        "per_day": per_day,
+        "expensive": per_day > DAILY_ROW_BUDGET,
+        "interval": update_interval,
+        "suggested_interval": min(
+            MINUTES_PER_DAY,
+            math.ceil(rows_per_update * MINUTES_PER_DAY / DAILY_ROW_BUDGET),
+        ),
+    }
+
+
+def cost_placeholders(cost):
+    """Return description placeholders presenting a cost estimate."""
+    return {
+        "rows": f"{cost['rows']:,}",
+        "per_day": f"{cost['per_day']:,}",
+        "interval": str(cost["interval"]),
+        "suggested_interval": str(cost["suggested_interval"]),
+    }
+
+
+def can_use_statistics(point, aggregate=None):
+    """Return True if a point can be read from long-term statistics.
+
+    For a group, ``aggregate`` is how its entities are combined; only some
+    combinations can be derived from the entities' hourly statistics.
+    """
+    if point["stat_type"] not in STATISTICS_STAT_TYPES or point.get(
+        "source_attribute"
+    ):
+        return False
+    return aggregate is None or (point["stat_type"], aggregate) in GROUP_STATISTICS
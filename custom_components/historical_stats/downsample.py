@@ -0,0 +1,92 @@
+"""Bounded-size downsampling of a point's window for sparklines.
+
+Samples are first reduced to the minimum and maximum of fixed time buckets,
+which can be done chunk by chunk while a window is streamed. For LTTB the
+bucket extremes are then reduced further with Largest-Triangle-Three-Buckets
+(the MinMaxLTTB approach), so memory stays bounded for any window length.
+"""
+
+SERIES_METHODS = ["lttb", "minmax"]
+
+# Upper bound on the points of one series, as offered in the point forms
+MAX_SERIES_POINTS = 1000
+
+# Bucket extremes kept per output point before running LTTB
+LTTB_PRESELECT_RATIO = 2
+
+
+def lttb(samples, threshold):
+    """Reduce (timestamp, value) samples to threshold points with LTTB."""
+    if threshold >= len(samples) or threshold < 3:
+        return list(samples)
+
+    result = [samples[0]]
+    bucket_size = (len(samples) - 2) / (threshold - 2)
+    previous = samples[0]
+
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        # Average of the next bucket is the third corner of the triangle
+        next_start = end
+        next_end = min(int((i + 2) * bucket_size) + 1, len(samples))
+        next_bucket = samples[next_start:next_end] or [samples[-1]]
+        avg_x = sum(x for x, _ in next_bucket) / len(next_bucket)
+        avg_y = sum(y for _, y in next_bucket) / len(next_bucket)
+
+        best, best_area = None, -1.0
+        for sample in samples[start:end]:
+            area = abs(
+                (previous[0] - avg_x) * (sample[1] - previous[1])
+                - (previous[0] - sample[0]) * (avg_y - previous[1])
+            )
+            if area > best_area:
+                best, best_area = sample, area
+        result.append(best)
+        previous = best
+
+    result.append(samples[-1])
+    return result
+
+
+class SeriesDownsampler:
+    """Fold (value, timestamp) samples into a bounded downsampled series."""
+
+    def __init__(self, start, end, points, method="lttb"):
+        self._start = start.timestamp()
+        self._points = points
+        self._method = method
+        buckets = max(1, points // 2)
+        if method == "lttb":
+            buckets *= LTTB_PRESELECT_RATIO
+        self._width = max(end.timestamp() - self._start, 1) / buckets
+        # Maps bucket index to its [min, max] (timestamp, value) samples
+        self._buckets = {}
+
+    def add(self, series):
+        """Fold a chronologically ordered list of samples."""
+        for value, ts in series:
+            sample = (ts.timestamp(), value)
+            index = int((sample[0] - self._start) // self._width)
+            extremes = self._buckets.get(index)
+            if extremes is None:
+                self._buckets[index] = [sample, sample]
+            elif value < extremes[0][1]:
+                extremes[0] = sample
+            elif value > extremes[1][1]:
+                extremes[1] = sample
+
+    def result(self):
+        """Return the downsampled series as [timestamp, value] pairs."""
+        samples = []
+        for index in sorted(self._buckets):
+            low, high = self._buckets[index]
+            samples.extend(sorted({low, high}))
+        if self._method == "lttb":
+            samples = lttb(samples, self._points)
+        if len(samples) > self._points:
+            # LTTB keeps every sample below 3 points and a single bucket still
+            # holds two extremes, so pick evenly spaced samples instead
+            step = len(samples) / self._points
+            samples = [samples[int(i * step)] for i in range(self._points)]
+        return [[ts, value] for ts, value in samples]
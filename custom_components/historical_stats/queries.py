@@ -0,0 +1,199 @@
+"""Blocking recorder queries, meant to be run in an executor."""
+
+from homeassistant.components.recorder.db_schema import (
+    StateAttributes,
+    States,
+    StatesMeta,
+)
+from homeassistant.components.recorder.history import get_significant_states
+from homeassistant.components.recorder.util import session_scope
+import homeassistant.util.dt as dt_util
+from homeassistant.util.json import json_loads
+from sqlalchemy import func, literal, select, union_all
+
+from .stats import find_closest, is_number
+
+# Lookups resolved per statement, keeping well below SQLite's limit of 500
+# selects in one compound statement
+VALUE_AT_BATCH = 100
+
+
+def fetch_states(hass, entity_id, start, end, attribute=None, start_state=True):
+    """Return the states recorded in an interval.
+
+    Attributes are only loaded from the database when ``attribute`` is given,
+    which avoids joining ``state_attributes`` for plain state lookups. With
+    ``start_state`` the state valid at ``start`` is included as well.
+    """
+    return get_significant_states(
+        hass,
+        start,
+        end,
+        [entity_id],
+        None,
+        start_state,
+        False,
+        no_attributes=attribute is None,
+    ).get(entity_id, [])
+
+
+def fetch_numeric_series(
+    hass, entity_id, start, end, attribute=None, start_state=True
+):
+    """Return numeric (value, last_changed) samples recorded in an interval.
+
+    The value is read from ``attribute`` when given, otherwise from the state.
+    States are reduced to samples here so full ``State`` objects never leave
+    the executor.
+    """
+    states = fetch_states(hass, entity_id, start, end, attribute, start_state)
+    return _numeric_samples(states, attribute)
+
+
+def fetch_group_series(
+    hass, entity_ids, merger, start, end, attribute=None, start_state=True
+):
+    """Return the aggregated samples of several entities in an interval.
+
+    All entities are read with one history query and aligned by ``merger``,
+    a GroupMerger that carries the entities' values over to the next chunk.
+    """
+    states = get_significant_states(
+        hass,
+        start,
+        end,
+        entity_ids,
+        None,
+        start_state,
+        False,
+        no_attributes=attribute is None,
+    )
+    return merger.merge(
+        {
+            entity_id: _member_samples(states.get(entity_id, []), attribute)
+            for entity_id in entity_ids
+        }
+    )
+
+
+def _numeric_samples(states, attribute):
+    """Reduce states to (value, last_changed) samples with a numeric value."""
+    if attribute is None:
+        return [(float(s.state), s.last_changed) for s in states if is_number(s.state)]
+    return [
+        (float(s.attributes[attribute]), s.last_changed)
+        for s in states
+        if is_number(s.attributes.get(attribute))
+    ]
+
+
+def _member_samples(states, attribute):
+    """Reduce states to (value, last_changed) samples, None if not numeric.
+
+    Unlike ``_numeric_samples`` non-numeric states such as ``unavailable``
+    are kept, so a group can leave the member out until it reports again.
+    """
+    samples = []
+    for s in states:
+        value = s.state if attribute is None else s.attributes.get(attribute)
+        samples.append((float(value) if is_number(value) else None, s.last_changed))
+    return samples
+
+
+def count_states(hass, entity_ids, start, end):
+    """Return the number of states recorded for entities in an interval.
+
+    Only the ``states`` index on metadata id and timestamp is used, so this is
+    much cheaper than fetching the rows.
+    """
+    with session_scope(hass=hass, read_only=True) as session:
+        return session.execute(
+            select(func.count(States.state_id))
+            .join(StatesMeta, States.metadata_id == StatesMeta.metadata_id)
+            .where(StatesMeta.entity_id.in_(entity_ids))
+            .where(States.last_updated_ts >= start.timestamp())
+            .where(States.last_updated_ts < end.timestamp())
+        ).scalar_one()
+
+
+def oldest_state_time(hass, entity_ids):
+    """Return when the oldest recorded state of the entities was written.
+
+    Like count_states this only touches the index on metadata id and
+    timestamp. Returns None when nothing is recorded for the entities.
+    """
+    with session_scope(hass=hass, read_only=True) as session:
+        timestamp = session.execute(
+            select(func.min(States.last_updated_ts))
+            .join(StatesMeta, States.metadata_id == StatesMeta.metadata_id)
+            .where(StatesMeta.entity_id.in_(entity_ids))
+        ).scalar_one()
+    return None if timestamp is None else dt_util.utc_from_timestamp(timestamp)
+
+
+def fetch_values_at(hass, entity_ids, targets, delta, attribute=None):
+    """Return the (value, last_changed) sample closest to each target.
+
+    As for a single value_at lookup, the candidates for a target are the state
+    in effect at it and the first state up to ``delta`` after it. Every target
+    of every entity is resolved by one statement of indexed single-row selects
+    instead of a history query per target. The result maps each entity id to
+    one sample per target, or None where the entity has no state.
+    """
+    columns = [States.state, States.last_updated_ts, States.last_changed_ts]
+    if attribute is not None:
+        columns.append(StateAttributes.shared_attrs)
+
+    def lookup(position, entity_id):
+        query = select(literal(position).label("lookup"), *columns)
+        if attribute is not None:
+            query = query.outerjoin(
+                StateAttributes,
+                States.attributes_id == StateAttributes.attributes_id,
+            )
+        metadata_id = (
+            select(StatesMeta.metadata_id)
+            .where(StatesMeta.entity_id == entity_id)
+            .scalar_subquery()
+        )
+        return query.where(States.metadata_id == metadata_id)
+
+    lookups = [(entity_id, target) for entity_id in entity_ids for target in targets]
+    candidates = [[] for _ in lookups]
+    with session_scope(hass=hass, read_only=True) as session:
+        for first in range(0, len(lookups), VALUE_AT_BATCH):
+            selects = []
+            for position, (entity_id, target) in enumerate(
+                lookups[first : first + VALUE_AT_BATCH], first
+            ):
+                ts = target.timestamp()
+                before = (
+                    lookup(position, entity_id)
+                    .where(States.last_updated_ts <= ts)
+                    .order_by(States.last_updated_ts.desc())
+                )
+                after = (
+                    lookup(position, entity_id)
+                    .where(States.last_updated_ts > ts)
+                    .where(States.last_updated_ts <= ts + delta.total_seconds())
+                    .order_by(States.last_updated_ts)
+                )
+                selects.append(before.limit(1).subquery().select())
+                selects.append(after.limit(1).subquery().select())
+            for row in session.execute(union_all(*selects)):
+                if attribute is None:
+                    value = row.state
+                else:
+                    value = json_loads(row.shared_attrs or "{}").get(attribute)
+                changed = dt_util.utc_from_timestamp(
+                    row.last_changed_ts or row.last_updated_ts
+                )
+                candidates[row.lookup].append((value, changed))
+
+    closest = [
+        find_closest(found, target) for (_, target), found in zip(lookups, candidates)
+    ]
+    return {
+        entity_id: closest[index * len(targets) : (index + 1) * len(targets)]
+        for index, entity_id in enumerate(entity_ids)
+    }
@@ -0,0 +1,95 @@
+"""Bounded, prioritized worker pool for recorder reads.
+
+All history and statistics reads of the integration go through one queue
+shared by every config entry. It hands them to the recorder's database
+executor, whose threads hold pooled connections, but never more than a fixed
+number at once, so a refresh of many sensors cannot crowd out the recorder's
+own work, and it starts the most urgent reads first.
+"""
+
+import heapq
+import itertools
+from functools import partial
+
+from homeassistant.components.recorder import get_instance
+
+from .const import DOMAIN
+
+DATA_QUEUE = f"{DOMAIN}_queue"
+
+# Priority levels, lowest runs first. Within a level shorter windows win.
+PRIORITY_USER = 0
+PRIORITY_SCHEDULED = 1
+PRIORITY_BACKGROUND = 2
+
+
+def query_priority(level, start, end):
+    """Return the sort key for a read covering start to end."""
+    return (level, (end - start).total_seconds())
+
+
+async def async_run_query(hass, priority, target, *args):
+    """Run a recorder read through the queue, or directly before setup."""
+    if (queue := hass.data.get(DATA_QUEUE)) is None:
+        return await get_instance(hass).async_add_executor_job(target, *args)
+    return await queue.async_run(priority, target, *args)
+
+
+class QueryQueue:
+    """Run blocking recorder reads a few at a time, highest priority first."""
+
+    def __init__(self, hass, max_concurrency):
+        self.hass = hass
+        self._max_concurrency = max_concurrency
+        self._pending = []
+        self._running = 0
+        self._sequence = itertools.count()
+
+    @property
+    def pending(self):
+        """Return the number of reads waiting for a worker."""
+        return len(self._pending)
+
+    @property
+    def running(self):
+        """Return the number of reads currently executing."""
+        return self._running
+
+    async def async_run(self, priority, target, *args):
+        """Queue a blocking call and return its result once it has run."""
+        future = self.hass.loop.create_future()
+        # The sequence number keeps equal priorities first in, first out
+        heapq.heappush(
+            self._pending, (priority, next(self._sequence), future, target, args)
+        )
+        self._dispatch()
+        return await future
+
+    def _dispatch(self):
+        """Start queued calls while there are free workers."""
+        while self._running < self._max_concurrency and self._pending:
+            _, _, future, target, args = heapq.heappop(self._pending)
+            if future.done():
+                # The caller was cancelled while waiting
+                continue
+            self._running += 1
+            job = get_instance(self.hass).async_add_executor_job(target, *args)
+            job.add_done_callback(partial(self._job_done, future))
+
+    def _job_done(self, future, job):
+        """Hand a finished call's outcome to its caller and start the next."""
+        self._running -= 1
+        if not future.done():
+            if job.cancelled():
+                future.cancel()
+            elif (err := job.exception()) is not None:
+                future.set_exception(err)
+            else:
+                future.set_result(job.result())
+        self._dispatch()
+
+    async def async_shutdown(self, _event=None):
+        """Drop queued calls; running ones finish on the recorder's executor."""
+        for _, _, future, _, _ in self._pending:
+            future.cancel()
+        self._pending.clear()
@@ -1,29 +1,94 @@
 """Sensor platform providing configurable historical statistics."""
 
-from datetime import datetime, timedelta, timezone
-from dateutil.relativedelta import relativedelta
+from datetime import timedelta
+from functools import partial
+
 from homeassistant.components.recorder.statistics import statistics_during_period
 
 import homeassistant.util.dt as dt_util
-from homeassistant.components.recorder.history import get_significant_states
 from homeassistant.components.sensor import SensorEntity
 from homeassistant.const import STATE_UNKNOWN
+from homeassistant.core import callback
 from homeassistant.helpers.event import async_track_time_interval
-
-from .const import STATE_ERROR, STATE_NO_DATA, STATE_OK
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN, STATE_ERROR, STATE_NO_DATA, STATE_OK
+from .downsample import SeriesDownsampler
+from .queries import (
+    fetch_group_series,
+    fetch_numeric_series,
+    fetch_states,
+    fetch_values_at,
+    oldest_state_time,
+)
+from .query_queue import (
+    PRIORITY_SCHEDULED,
+    PRIORITY_USER,
+    async_run_query,
+    query_priority,
+)
+from .stats import (
+    LOOKUP_STAT_TYPES,
+    STATISTICS_STAT_TYPES,
+    THRESHOLD_STAT_TYPES,
+    VALUE_AT_DELTA,
+    GROUP_STATISTICS,
+    GroupMerger,
+    StatAccumulator,
+    aggregate_values,
+    find_closest,
+    group_id,
+    is_closed_period,
+    is_number,
+    point_label,
+    point_threshold,
+    point_window,
+    value_at_targets,
+)
 from homeassistant.util import slugify
 
-# Earliest possible date for "all history" calculations.
-HA_START = datetime(2013, 11, 1, tzinfo=timezone.utc)
+# Chunking of long windows. Each chunk is fetched, folded and discarded.
+STREAM_INITIAL_CHUNK = timedelta(days=30)
+STREAM_MIN_CHUNK = timedelta(hours=6)
+STREAM_MAX_CHUNK = timedelta(days=365)
+STREAM_TARGET_ROWS = 20000
+
+STORAGE_VERSION = 1
+
+# Maps entity id to the sensor, for lookups from the websocket API
+DATA_ENTITIES = f"{DOMAIN}_entities"
+
+
+def sensor_unique_id(source_id):
+    """Return the unique id of the sensor reading an entity or group."""
+    return f"historical_stats_{slugify(source_id)}"
+
+
+def closed_results_store(hass, unique_id):
+    """Return the store holding a sensor's results of closed periods."""
+    return Store(hass, STORAGE_VERSION, f"{DOMAIN}.{unique_id}")
 
 
 async def async_setup_entry(hass, entry, async_add_entities):
     """Set up a HistoricalStatsSensor from a config entry."""
-    entity_id = entry.data["entity_id"]
     points = entry.options.get("points", [])
     update_interval = entry.data.get("update_interval", 30)
     friendly_name = entry.data.get("friendly_name")
 
+    if entity_ids := entry.data.get("entity_ids"):
+        sensor = HistoricalStatsGroupSensor(
+            hass,
+            f"Historical statistics for {friendly_name}",
+            friendly_name,
+            entity_ids,
+            entry.data["aggregate"],
+            points,
+            update_interval,
+        )
+        async_add_entities([sensor], update_before_add=True)
+        return
+
+    entity_id = entry.data["entity_id"]
     if not friendly_name:
         state = hass.states.get(entity_id)
         friendly_name = state.name if state else entity_id
@@ -36,14 +101,46 @@ async def async_setup_entry(hass, entry, async_add_entities):
     )
 
 
+def _reduce_hourly(stat_type, values):
+    """Reduce hourly statistics values to one value for a window."""
+    if not values:
+        return STATE_UNKNOWN
+    if stat_type == "mean":
+        return sum(values) / len(values)
+    return min(values) if stat_type == "min" else max(values)
+
+
+def _sample_value(value):
+    """Return a looked up value as a number when it is numeric."""
+    return float(value) if is_number(value) else value
+
+
+def _diff_results(old_state, old_attrs, new_state, new_attrs):
+    """Return the changes between two sets of results, or None if equal."""
+    diff = {}
+    if new_state != old_state:
+        diff["state"] = new_state
+    changed = {
+        key: value
+        for key, value in new_attrs.items()
+        if key not in old_attrs or old_attrs[key] != value
+    }
+    if changed:
+        diff["changed"] = changed
+    if removed := [key for key in old_attrs if key not in new_attrs]:
+        diff["removed"] = removed
+    return diff or None
+
+
 class HistoricalStatsSensor(SensorEntity):
     """Sensor that calculates historical statistics for a given entity."""
 
     def __init__(self, hass, name, entity_id, points, update_interval):
         self.hass = hass
         self._attr_name = name
-        self._attr_unique_id = f"historical_stats_{slugify(entity_id)}"
+        self._attr_unique_id = sensor_unique_id(entity_id)
         self._entity_id = entity_id
+        self._entity_ids = [entity_id]
         # Each point defines a statistic type and time window
         self._points = points
         self._attr_native_value = STATE_UNKNOWN
@@ -51,9 +148,19 @@ class HistoricalStatsSensor(SensorEntity):
         self._update_interval = timedelta(minutes=update_interval)
         self._unsub_timer = None
         self._attr_should_poll = False
+        # Downsampled series per point label, served over the websocket API
+        self._series = {}
+        # Results of closed calendar periods, loaded from storage when needed
+        self._store = None
+        self._closed_results = None
+        # Callbacks receiving a diff of the results after each update
+        self._listeners = []
+        # Time of the oldest recorded state; purges only ever move it forward
+        self._oldest_state = None
 
     async def async_added_to_hass(self):
         """Handle when entity is added to Home Assistant."""
+        self.hass.data.setdefault(DATA_ENTITIES, {})[self.entity_id] = self
         await self.async_update()
         self.async_write_ha_state()
         self._unsub_timer = async_track_time_interval(
@@ -61,160 +168,361 @@ class HistoricalStatsSensor(SensorEntity):
         )
 
     async def async_will_remove_from_hass(self):
-        """Cancel scheduled updates when entity is removed."""
+        """Cancel scheduled updates and end subscriptions when removed."""
+        self.hass.data.get(DATA_ENTITIES, {}).pop(self.entity_id, None)
         if self._unsub_timer:
             self._unsub_timer()
             self._unsub_timer = None
+        # Reloading creates a new sensor, so listeners of this one are done
+        listeners, self._listeners = self._listeners, []
+        for listener in listeners:
+            listener(None)
 
     async def _handle_interval(self, _now):
         """Update the sensor at the scheduled interval."""
-        await self.async_update()
+        await self._async_refresh(PRIORITY_SCHEDULED)
         self.async_write_ha_state()
 
+    @callback
+    def async_subscribe(self, listener):
+        """Call listener with the changed results after each update.
+
+        The listener is called with None once the sensor is removed, e.g.
+        when its entry reloads after the options were saved. Returns a
+        callback that removes the listener.
+        """
+        self._listeners.append(listener)
+
+        @callback
+        def unsubscribe():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return unsubscribe
+
+    @property
+    def series(self):
+        """Return the downsampled series of the last update."""
+        return self._series
+
     @property
     def suggested_object_id(self):
         """Return stable entity id based on source entity."""
         return f"historical_stats_{slugify(self._entity_id)}"
 
-    @staticmethod
-    def _delta_from_unit(unit, value):
-        """Return timedelta or relativedelta for a unit."""
-        return {
-            "minutes": timedelta(minutes=value),
-            "hours": timedelta(hours=value),
-            "days": timedelta(days=value),
-            "weeks": timedelta(weeks=value),
-            "months": relativedelta(months=value),
-            "years": relativedelta(years=value),
-        }.get(unit, timedelta(days=value))
-
     async def async_update(self):
-        """Fetch and calculate statistics for each point."""
+        """Fetch and calculate statistics when requested by Home Assistant."""
+        await self._async_refresh(PRIORITY_USER)
+
+    async def _async_refresh(self, level):
+        """Fetch and calculate statistics for each point.
+
+        Recorder reads are queued at the given priority level. Points that
+        scan the same window are computed together from a single pass over
+        its states. Results of closed calendar periods are reused until the
+        period rolls over.
+        """
         now = dt_util.utcnow()
         attrs = {}
+        series = {}
         status = STATE_OK
-
-        # Iterate over configured measurement points
-        for i, point in enumerate(self._points, 1):
-            stat_type = point["stat_type"]
-            unit = point.get("time_unit", "days")
-            value = int(point.get("time_value", 1))
-            unit_to = point.get("time_unit_to")
-            value_to = int(point.get("time_value_to", 0))
-
-            from_prefix = "full" if unit == "all" else f"{unit}_{value}"
-            if unit_to:
-                to_prefix = "full" if unit_to == "all" else f"{unit_to}_{value_to}"
-                prefix = f"{from_prefix}_to_{to_prefix}"
-            else:
-                prefix = from_prefix
-            label = f"{prefix}_{stat_type}"
-
+        closed_results = {}
+        await self._async_load_closed_results()
+
+        # Maps label to the point's result, or None if it failed
+        results = {}
+        windows = {}
+        groups = {}
+        for point in self._points:
+            label = point_label(point)
             try:
-                if unit == "all":
-                    start = HA_START
+                start, end = point_window(point, now)
+                windows[label] = (start, end)
+                cached = self._closed_results.get(label)
+                if (
+                    cached is not None
+                    and cached["start"] == start.isoformat()
+                    and cached["point"] == point
+                ):
+                    results[label] = cached["result"]
+                elif self._scans_window(point):
+                    key = (start, end, point.get("source_attribute") or None)
+                    groups.setdefault(key, []).append(point)
                 else:
-                    start = now - self._delta_from_unit(unit, value)
-
-                end = now - self._delta_from_unit(unit_to, value_to) if unit_to else now
-
-                if stat_type == "value_at":
-                    target_time = start
-                    states = await self._get_states_around(
-                        target_time, delta=timedelta(minutes=10)
+                    results[label] = await self._async_compute_point(
+                        point, start, end, query_priority(level, start, end)
                     )
-                    found = self._find_closest_state(states, target_time)
-                    if found:
-                        attrs[label] = found.state
-                        attrs[f"{label}_ts"] = found.last_changed.isoformat()
-                        attrs[f"{label}_ts_human"] = dt_util.as_local(
-                            found.last_changed
-                        ).strftime("%Y-%m-%d %H:%M:%S")
-                    else:
-                        attrs[label] = STATE_UNKNOWN
-                    continue
-
-                states = await self._get_states_interval(start, end)
-                numeric_states = [
-                    (float(s.state), s) for s in states if self._is_number(s.state)
-                ]
-                values_only = [val for val, _ in numeric_states]
-
-                if not numeric_states:
-                    # Try long-term statistics if states were purged
-                    fallback = await self._stats_fallback(stat_type, start, end)
-                    if fallback is not None:
-                        attrs[label] = fallback
-                        if fallback is STATE_UNKNOWN and status == STATE_OK:
-                            status = STATE_NO_DATA
-                        continue
-                    attrs[label] = STATE_UNKNOWN
-                    if status == STATE_OK:
-                        status = STATE_NO_DATA
-                    continue
-
-                if stat_type == "min":
-                    min_val, min_state = min(numeric_states, key=lambda x: x[0])
-                    attrs[label] = min_val
-                    attrs[f"{label}_ts"] = min_state.last_changed.isoformat()
-                    attrs[f"{label}_ts_human"] = dt_util.as_local(
-                        min_state.last_changed
-                    ).strftime("%Y-%m-%d %H:%M:%S")
-                elif stat_type == "max":
-                    max_val, max_state = max(numeric_states, key=lambda x: x[0])
-                    attrs[label] = max_val
-                    attrs[f"{label}_ts"] = max_state.last_changed.isoformat()
-                    attrs[f"{label}_ts_human"] = dt_util.as_local(
-                        max_state.last_changed
-                    ).strftime("%Y-%m-%d %H:%M:%S")
-                elif stat_type == "mean":
-                    attrs[label] = sum(values_only) / len(values_only)
-                elif stat_type == "total":
-                    attrs[label] = (
-                        values_only[-1] - values_only[0]
-                        if len(values_only) >= 2
-                        else STATE_UNKNOWN
+            except Exception:
+                results[label] = None
+
+        for (start, end, attribute), points in groups.items():
+            try:
+                results.update(
+                    await self._async_compute_window(
+                        points, start, end, attribute, query_priority(level, start, end)
                     )
-                elif stat_type == "sum":
-                    attrs[label] = sum(values_only)
-                else:
-                    attrs[label] = STATE_UNKNOWN
+                )
             except Exception:
+                results.update({point_label(point): None for point in points})
+
+        for point in self._points:
+            label = point_label(point)
+            result = results.get(label)
+            if result is None:
                 status = STATE_ERROR
                 attrs[label] = STATE_UNKNOWN
                 continue
-
+            if is_closed_period(point) and not result["no_data"]:
+                closed_results[label] = {
+                    "start": windows[label][0].isoformat(),
+                    "point": point,
+                    "result": result,
+                }
+
+            attrs.update(result["attrs"])
+            if result["series"] is not None:
+                series[label] = result["series"]
+            if result["no_data"] and status == STATE_OK:
+                status = STATE_NO_DATA
+
+        diff = _diff_results(
+            self._attr_native_value, self._attr_extra_state_attributes, status, attrs
+        )
         self._attr_extra_state_attributes = attrs
         self._attr_native_value = status
+        self._series = series
+        if diff:
+            for listener in list(self._listeners):
+                listener(diff)
+        if closed_results != self._closed_results:
+            self._closed_results = closed_results
+            self._store.async_delay_save(lambda: self._closed_results, 10)
+
+    async def _async_load_closed_results(self):
+        """Load persisted results of closed periods on the first refresh."""
+        if self._closed_results is not None:
+            return
+        self._closed_results = {}
+        if any(is_closed_period(point) for point in self._points):
+            self._store = closed_results_store(self.hass, self._attr_unique_id)
+            self._closed_results = await self._store.async_load() or {}
+
+    async def _async_compute_point(self, point, start, end, priority):
+        """Compute one measurement point over start to end.
+
+        Returns a dict with the attributes of the point, its downsampled
+        series (or None) and whether no data was found.
+        """
+        stat_type = point["stat_type"]
+        attribute = point.get("source_attribute") or None
+        label = point_label(point)
+        attrs = {}
+        result = {"attrs": attrs, "series": None, "no_data": False}
+
+        if stat_type == "value_at":
+            found = await self._async_value_at(priority, start, attribute)
+            if found:
+                value, changed = found
+                attrs[label] = value
+                attrs[f"{label}_ts"] = changed.isoformat()
+                attrs[f"{label}_ts_human"] = dt_util.as_local(changed).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+            else:
+                attrs[label] = STATE_UNKNOWN
+            return result
 
-    async def _get_states_around(self, target_time, delta=timedelta(minutes=10)):
-        """Return all states within +-delta of target_time."""
-        start = target_time - delta
-        end = target_time + delta
-        return await self._get_states_interval(start, end)
-
-    async def _get_states_interval(self, start, end):
-        """Return all recorded states in interval."""
-        return (
-            await self.hass.async_add_executor_job(
-                get_significant_states,
-                self.hass,
-                start,
-                end,
-                [self._entity_id],
-                None,
-                True,
-                False,
+        if stat_type == "value_at_series":
+            # One batched lookup for every offset, newest first
+            samples = await self._async_values_at(
+                priority, value_at_targets(point, end), attribute
             )
-        )[self._entity_id]
+            attrs[label] = [
+                None if found is None else _sample_value(found[0])
+                for found in samples
+            ]
+            attrs[f"{label}_ts"] = [
+                None if found is None else found[1].isoformat() for found in samples
+            ]
+            result["no_data"] = all(found is None for found in samples)
+            return result
+
+        if point.get("use_statistics") and not attribute:
+            # Read hourly long-term statistics instead of states
+            value = await self._stats_fallback(priority, stat_type, start, end)
+            if value is not None:
+                attrs[label] = value
+                result["no_data"] = value == STATE_UNKNOWN
+                return result
+
+        results = await self._async_compute_window(
+            [point], start, end, attribute, priority
+        )
+        return results[label]
 
     @staticmethod
-    def _is_number(val):
-        try:
-            float(val)
-            return True
-        except Exception:
+    def _scans_window(point):
+        """Return True if a point is computed from the states of its window."""
+        if point["stat_type"] in LOOKUP_STAT_TYPES:
             return False
+        return not (
+            point.get("use_statistics")
+            and not point.get("source_attribute")
+            and point["stat_type"] in STATISTICS_STAT_TYPES
+        )
+
+    async def _async_compute_window(self, points, start, end, attribute, priority):
+        """Compute points sharing a window from one pass over its states.
+
+        Returns a dict mapping each point's label to its result.
+        """
+        thresholds = {
+            point_threshold(point)
+            for point in points
+            if point["stat_type"] in THRESHOLD_STAT_TYPES
+        }
+        accumulator = StatAccumulator(end, thresholds)
+        folders = [accumulator]
+        downsamplers = {}
+        for point in points:
+            if series_points := int(point.get("series_points") or 0):
+                downsampler = SeriesDownsampler(
+                    start, end, series_points, point.get("series_method") or "lttb"
+                )
+                downsamplers[point_label(point)] = downsampler
+                folders.append(downsampler)
+        await self._async_fold_interval(priority, folders, start, end, attribute)
+
+        results = {}
+        for point in points:
+            stat_type = point["stat_type"]
+            label = point_label(point)
+            attrs = {}
+            result = {"attrs": attrs, "series": None, "no_data": False}
+            results[label] = result
+            if (downsampler := downsamplers.get(label)) is not None:
+                result["series"] = {
+                    "start": start.isoformat(),
+                    "end": end.isoformat(),
+                    "points": downsampler.result(),
+                }
+
+            if not accumulator.count:
+                # Try long-term statistics if states were purged. They only
+                # exist for the state, not for its attributes.
+                fallback = (
+                    None
+                    if attribute
+                    else await self._stats_fallback(priority, stat_type, start, end)
+                )
+                attrs[label] = STATE_UNKNOWN if fallback is None else fallback
+                result["no_data"] = attrs[label] == STATE_UNKNOWN
+                continue
+
+            value, ts = accumulator.result(stat_type, point_threshold(point))
+            attrs[label] = value
+            if ts is not None:
+                attrs[f"{label}_ts"] = ts.isoformat()
+                attrs[f"{label}_ts_human"] = dt_util.as_local(ts).strftime(
+                    "%Y-%m-%d %H:%M:%S"
+                )
+        return results
+
+    async def _async_query(self, priority, target, *args):
+        """Run a blocking recorder read through the shared query queue."""
+        return await async_run_query(self.hass, priority, target, *args)
+
+    async def _async_fold_interval(self, priority, folders, start, end, attribute=None):
+        """Fold the numeric samples of an interval into accumulators.
+
+        The interval is fetched in time chunks that are discarded once folded,
+        so peak memory stays flat however long the window is. The chunk span
+        adapts to the observed row density, aiming for STREAM_TARGET_ROWS rows
+        per fetch. Long windows start at the oldest recorded state rather than
+        fetching empty chunks from before it.
+        """
+        reader = self._series_reader()
+        span = STREAM_INITIAL_CHUNK
+        cursor = start
+        if end - start > span:
+            if (oldest := await self._async_oldest_state(priority)) is None:
+                return
+            cursor = max(cursor, oldest)
+        first = cursor
+        while cursor < end:
+            chunk_end = min(cursor + span, end)
+            series = await self._async_query(
+                priority,
+                reader,
+                cursor,
+                chunk_end,
+                attribute,
+                # Only the first chunk needs the state valid at its start
+                cursor == first,
+            )
+            for folder in folders:
+                folder.add(series)
+            factor = min(2, STREAM_TARGET_ROWS / len(series)) if series else 2
+            span = min(max(span * factor, STREAM_MIN_CHUNK), STREAM_MAX_CHUNK)
+            cursor = chunk_end
+
+    async def _async_oldest_state(self, priority):
+        """Return the time of the oldest recorded state of the source."""
+        if self._oldest_state is None:
+            self._oldest_state = await self._async_query(
+                priority, oldest_state_time, self.hass, self._entity_ids
+            )
+        return self._oldest_state
+
+    def _series_reader(self):
+        """Return a blocking reader of the samples of one window.
+
+        It is called per chunk with start, end, the source attribute and
+        whether to include the state valid at start.
+        """
+        return partial(fetch_numeric_series, self.hass, self._entity_id)
+
+    async def _async_value_at(self, priority, target_time, attribute=None):
+        """Return the (value, last_changed) recorded closest to target_time."""
+        states = await self._get_states_around(
+            priority, target_time, VALUE_AT_DELTA, attribute
+        )
+        found = self._find_closest_state(states, target_time)
+        if found is None:
+            return None
+        if attribute:
+            return found.attributes.get(attribute, STATE_UNKNOWN), found.last_changed
+        return found.state, found.last_changed
+
+    async def _async_values_at(self, priority, targets, attribute=None):
+        """Return the sample closest to each target, or None, in one query."""
+        samples = await self._async_query(
+            priority,
+            fetch_values_at,
+            self.hass,
+            [self._entity_id],
+            targets,
+            VALUE_AT_DELTA,
+            attribute,
+        )
+        return samples[self._entity_id]
+
+    async def _get_states_around(
+        self, priority, target_time, delta=VALUE_AT_DELTA, attribute=None
+    ):
+        """Return all states within +-delta of target_time."""
+        start = target_time - delta
+        end = target_time + delta
+        return await self._get_states_interval(priority, start, end, attribute)
+
+    async def _get_states_interval(self, priority, start, end, attribute=None):
+        """Return all recorded states in interval.
+
+        Attributes are only loaded when a source attribute is requested.
+        """
+        return await self._async_query(
+            priority, fetch_states, self.hass, self._entity_id, start, end, attribute
+        )
 
     @staticmethod
     def _find_closest_state(states, target_time):
@@ -223,12 +531,13 @@ class HistoricalStatsSensor(SensorEntity):
             return None
         return min(states, key=lambda s: abs(s.last_changed - target_time))
 
-    async def _stats_fallback(self, stat_type, start, end):
+    async def _stats_fallback(self, priority, stat_type, start, end):
         """Return value from long-term statistics if available."""
-        if stat_type not in {"min", "max", "mean"}:
+        if stat_type not in STATISTICS_STAT_TYPES:
             return None
 
-        stats = await self.hass.async_add_executor_job(
+        stats = await self._async_query(
+            priority,
             statistics_during_period,
             self.hass,
             start,
@@ -239,15 +548,108 @@ class HistoricalStatsSensor(SensorEntity):
             {stat_type},
         )
 
-        rows = stats.get(self._entity_id)
-        if not rows:
-            return STATE_UNKNOWN
-
+        rows = stats.get(self._entity_id, [])
         values = [row.get(stat_type) for row in rows if row.get(stat_type) is not None]
-        if not values:
-            return STATE_UNKNOWN
+        return _reduce_hourly(stat_type, values)
+
+
+class HistoricalStatsGroupSensor(HistoricalStatsSensor):
+    """Sensor that calculates historical statistics of a group of entities.
 
-        if stat_type == "mean":
-            return sum(values) / len(values)
+    The entities are read together and combined into one series with the
+    group's aggregate, e.g. the summed power of several circuits, which is
+    then treated like the series of a single entity.
+    """
+
+    def __init__(
+        self, hass, name, group_name, entity_ids, aggregate, points, update_interval
+    ):
+        super().__init__(
+            hass, name, group_id(entity_ids, aggregate), points, update_interval
+        )
+        self._group_name = group_name
+        self._entity_ids = entity_ids
+        self._aggregate = aggregate
+
+    @property
+    def suggested_object_id(self):
+        """Return stable entity id based on the group name."""
+        return f"historical_stats_{slugify(self._group_name)}"
+
+    def _series_reader(self):
+        """Return a blocking reader of the aggregated samples of one window."""
+        return partial(
+            fetch_group_series,
+            self.hass,
+            self._entity_ids,
+            GroupMerger(self._aggregate),
+        )
+
+    async def _async_value_at(self, priority, target_time, attribute=None):
+        """Return the aggregated sample closest to target_time."""
+        samples = await self._async_query(
+            priority,
+            self._series_reader(),
+            target_time - VALUE_AT_DELTA,
+            target_time + VALUE_AT_DELTA,
+            attribute,
+            True,
+        )
+        return find_closest(samples, target_time)
+
+    async def _async_values_at(self, priority, targets, attribute=None):
+        """Return the aggregate of the entities' values at each target."""
+        samples = await self._async_query(
+            priority,
+            fetch_values_at,
+            self.hass,
+            self._entity_ids,
+            targets,
+            VALUE_AT_DELTA,
+            attribute,
+        )
+        results = []
+        # One sample or None per entity at each target
+        for at_target in zip(*samples.values()):
+            found = [
+                (float(sample[0]), sample[1])
+                for sample in at_target
+                if sample is not None and is_number(sample[0])
+            ]
+            if not found:
+                results.append(None)
+                continue
+            values = [value for value, _ in found]
+            changed = max(changed for _, changed in found)
+            results.append((aggregate_values(values, self._aggregate), changed))
+        return results
+
+    async def _stats_fallback(self, priority, stat_type, start, end):
+        """Return a group value from long-term statistics if it can be derived.
+
+        The entities' hourly rows are combined per hour, which is exact for
+        the minimum of minimums, the maximum of maximums and the mean of a sum
+        or mean. Other combinations have no fallback.
+        """
+        if (stat_type, self._aggregate) not in GROUP_STATISTICS:
+            return None
+
+        stats = await self._async_query(
+            priority,
+            statistics_during_period,
+            self.hass,
+            start,
+            end,
+            set(self._entity_ids),
+            "hour",
+            None,
+            {stat_type},
+        )
 
-        return min(values) if stat_type == "min" else max(values)
+        hours = {}
+        for rows in stats.values():
+            for row in rows:
+                if (value := row.get(stat_type)) is not None:
+                    hours.setdefault(row["start"], []).append(value)
+        values = [aggregate_values(hour, self._aggregate) for hour in hours.values()]
+        return _reduce_hourly(stat_type, values)
@@ -0,0 +1,356 @@
+"""Shared helpers for resolving measurement points and computing statistics."""
+
+import hashlib
+import heapq
+from datetime import datetime, timedelta, timezone
+from operator import itemgetter
+
+import homeassistant.util.dt as dt_util
+from dateutil.relativedelta import relativedelta
+from homeassistant.const import STATE_UNKNOWN
+from homeassistant.util import slugify
+
+# Earliest possible date for "all history" calculations.
+HA_START = datetime(2013, 11, 1, tzinfo=timezone.utc)
+
+# Calendar-aligned periods in local time. Closed periods have ended, so their
+# results only change when the period rolls over.
+CALENDAR_UNITS = [
+    "today",
+    "yesterday",
+    "this_week",
+    "last_week",
+    "this_month",
+    "last_month",
+    "this_year",
+    "last_year",
+]
+CLOSED_CALENDAR_UNITS = {"yesterday", "last_week", "last_month", "last_year"}
+
+# Statistic types comparing the value against a per-point threshold.
+THRESHOLD_STAT_TYPES = {
+    "time_above",
+    "time_below",
+    "crossings_above",
+    "crossings_below",
+}
+
+# Statistic types available from hourly long-term statistics.
+STATISTICS_STAT_TYPES = {"min", "max", "mean"}
+
+# Window used when looking up the state closest to a point in time.
+VALUE_AT_DELTA = timedelta(minutes=10)
+
+# Statistic types looking up single moments instead of scanning a window.
+LOOKUP_STAT_TYPES = {"value_at", "value_at_series"}
+
+# How the values of a group's entities are combined at each moment.
+GROUP_AGGREGATES = ["sum", "mean", "min", "max"]
+
+# Statistic types and group aggregates that long-term statistics can answer.
+GROUP_STATISTICS = {
+    ("min", "min"),
+    ("max", "max"),
+    ("mean", "sum"),
+    ("mean", "mean"),
+}
+
+
+def delta_from_unit(unit, value):
+    """Return timedelta or relativedelta for a unit."""
+    return {
+        "minutes": timedelta(minutes=value),
+        "hours": timedelta(hours=value),
+        "days": timedelta(days=value),
+        "weeks": timedelta(weeks=value),
+        "months": relativedelta(months=value),
+        "years": relativedelta(years=value),
+    }.get(unit, timedelta(days=value))
+
+
+def calendar_window(unit, now):
+    """Return the (start, end) interval of a calendar period containing now."""
+    today = dt_util.as_local(now).date()
+    if unit in ("today", "yesterday"):
+        current = today
+        previous = today - timedelta(days=1)
+    elif unit in ("this_week", "last_week"):
+        current = today - timedelta(days=today.weekday())
+        previous = current - timedelta(weeks=1)
+    elif unit in ("this_month", "last_month"):
+        current = today.replace(day=1)
+        previous = current - relativedelta(months=1)
+    else:
+        current = today.replace(month=1, day=1)
+        previous = current.replace(year=current.year - 1)
+
+    current_start = dt_util.as_utc(dt_util.start_of_local_day(current))
+    if unit in CLOSED_CALENDAR_UNITS:
+        return dt_util.as_utc(dt_util.start_of_local_day(previous)), current_start
+    return current_start, now
+
+
+def is_closed_period(point):
+    """Return True if a point covers a calendar period that has ended."""
+    return point.get("time_unit") in CLOSED_CALENDAR_UNITS
+
+
+def point_label(point):
+    """Return the attribute label used for a measurement point."""
+    unit = point.get("time_unit", "days")
+    value = int(point.get("time_value", 1))
+    unit_to = point.get("time_unit_to")
+    value_to = int(point.get("time_value_to") or 0)
+
+    if unit in CALENDAR_UNITS:
+        prefix = unit
+    elif unit == "all":
+        prefix = "full"
+    else:
+        prefix = f"{unit}_{value}"
+    if unit_to and unit not in CALENDAR_UNITS:
+        to_prefix = "full" if unit_to == "all" else f"{unit_to}_{value_to}"
+        prefix = f"{prefix}_to_{to_prefix}"
+    if attribute := point.get("source_attribute"):
+        prefix = f"{slugify(attribute)}_{prefix}"
+    label = f"{prefix}_{point['stat_type']}"
+    if point["stat_type"] in THRESHOLD_STAT_TYPES:
+        # e.g. 25 -> "25" and -2.5 -> "minus_2_5"
+        threshold = f"{point_threshold(point):g}"
+        label = f"{label}_{threshold.replace('-', 'minus_').replace('.', '_')}"
+    return label
+
+
+def value_at_targets(point, now):
+    """Return the moments a value_at_series point looks up, newest first.
+
+    The point's unit is the offset between lookups and its value the number
+    of lookups, e.g. the same time on each of the last 7 days.
+    """
+    unit = point.get("time_unit", "days")
+    count = int(point.get("time_value", 1))
+    return [now - delta_from_unit(unit, offset) for offset in range(1, count + 1)]
+
+
+def point_threshold(point):
+    """Return the threshold a point compares values against."""
+    return float(point.get("threshold") or 0)
+
+
+def point_window(point, now):
+    """Return the (start, end) interval a point covers when evaluated at now."""
+    unit = point.get("time_unit", "days")
+    value = int(point.get("time_value", 1))
+    unit_to = point.get("time_unit_to")
+    value_to = int(point.get("time_value_to") or 0)
+
+    if unit in CALENDAR_UNITS:
+        return calendar_window(unit, now)
+    start = HA_START if unit == "all" else now - delta_from_unit(unit, value)
+    end = now - delta_from_unit(unit_to, value_to) if unit_to else now
+    return start, end
+
+
+def is_number(val):
+    """Return True if val can be interpreted as a float."""
+    try:
+        float(val)
+        return True
+    except Exception:
+        return False
+
+
+def find_closest(series, target_time):
+    """Return the (value, timestamp) sample closest to target_time."""
+    if not series:
+        return None
+    return min(series, key=lambda sample: abs(sample[1] - target_time))
+
+
+class StatAccumulator:
+    """Fold (value, timestamp) samples into running aggregates.
+
+    Samples must be added in chronological order. Only the aggregates are
+    kept, so a long window can be folded chunk by chunk with flat memory use.
+
+    Time-weighted statistics hold each value until the next sample, and the
+    last one until ``end``. Durations and crossings are tracked for every
+    value in ``thresholds``.
+    """
+
+    def __init__(self, end=None, thresholds=()):
+        self.count = 0
+        self.sum = 0.0
+        self.first = None
+        self.last = None
+        self.min = None
+        self.max = None
+        self._end = end
+        # Integral of value over time and the seconds it covers
+        self._area = 0.0
+        self._seconds = 0.0
+        self._thresholds = {
+            threshold: {
+                "time_above": 0.0,
+                "time_below": 0.0,
+                "crossings_above": 0,
+                "crossings_below": 0,
+            }
+            for threshold in thresholds
+        }
+
+    def add(self, series):
+        """Fold a chronologically ordered list of samples."""
+        for sample in series:
+            value = sample[0]
+            if self.count == 0:
+                self.first = self.min = self.max = sample
+            else:
+                self._hold(self.last, sample[1])
+                previous = self.last[0]
+                for threshold, totals in self._thresholds.items():
+                    if value > threshold >= previous:
+                        totals["crossings_above"] += 1
+                    elif value < threshold <= previous:
+                        totals["crossings_below"] += 1
+                if value < self.min[0]:
+                    self.min = sample
+                elif value > self.max[0]:
+                    self.max = sample
+            self.last = sample
+            self.count += 1
+            self.sum += value
+
+    def _hold(self, sample, until):
+        """Account for sample's value being held until the given time."""
+        seconds = (until - sample[1]).total_seconds()
+        if seconds <= 0:
+            return
+        value = sample[0]
+        self._area += value * seconds
+        self._seconds += seconds
+        for threshold, totals in self._thresholds.items():
+            if value > threshold:
+                totals["time_above"] += seconds
+            elif value < threshold:
+                totals["time_below"] += seconds
+
+    def result(self, stat_type, threshold=None):
+        """Return the ``(value, timestamp)`` result for a statistic type.
+
+        The timestamp is only set for statistics that refer to a single sample
+        (min and max). Durations are returned in hours.
+        """
+        if stat_type == "min":
+            return self.min
+        if stat_type == "max":
+            return self.max
+        if stat_type == "mean":
+            return self.sum / self.count, None
+        if stat_type == "total":
+            if self.count >= 2:
+                return self.last[0] - self.first[0], None
+            return STATE_UNKNOWN, None
+        if stat_type == "sum":
+            return self.sum, None
+
+        # The last value is held until the end of the window
+        tail = 0.0
+        if self._end is not None:
+            tail = max(0.0, (self._end - self.last[1]).total_seconds())
+        last = self.last[0]
+
+        if stat_type == "time_weighted_mean":
+            seconds = self._seconds + tail
+            if not seconds:
+                return last, None
+            return (self._area + last * tail) / seconds, None
+        if threshold not in self._thresholds:
+            return STATE_UNKNOWN, None
+        totals = self._thresholds[threshold]
+        if stat_type == "time_above":
+            seconds = totals["time_above"] + (tail if last > threshold else 0.0)
+            return seconds / 3600, None
+        if stat_type == "time_below":
+            seconds = totals["time_below"] + (tail if last < threshold else 0.0)
+            return seconds / 3600, None
+        if stat_type in ("crossings_above", "crossings_below"):
+            return totals[stat_type], None
+        return STATE_UNKNOWN, None
+
+
+def compute_stat(stat_type, series, end=None, threshold=None):
+    """Compute a statistic over a non-empty list of (value, timestamp) samples."""
+    thresholds = () if threshold is None else (threshold,)
+    accumulator = StatAccumulator(end, thresholds)
+    accumulator.add(series)
+    return accumulator.result(stat_type, threshold)
+
+
+def entry_entity_ids(data):
+    """Return the source entities of a config entry's data."""
+    return data.get("entity_ids") or [data["entity_id"]]
+
+
+def entry_source_id(data):
+    """Return the entity or group id a config entry's sensor reads."""
+    if entity_ids := data.get("entity_ids"):
+        return group_id(entity_ids, data["aggregate"])
+    return data["entity_id"]
+
+
+def group_id(entity_ids, aggregate):
+    """Return a stable id for an aggregate over a set of entities."""
+    members = ",".join(sorted(entity_ids))
+    return f"group_{aggregate}_{hashlib.sha1(members.encode()).hexdigest()[:10]}"
+
+
+def aggregate_values(values, aggregate):
+    """Combine the current values of a group's entities."""
+    if aggregate == "sum":
+        return sum(values)
+    if aggregate == "mean":
+        return sum(values) / len(values)
+    return min(values) if aggregate == "min" else max(values)
+
+
+class GroupMerger:
+    """Align the samples of several entities into one aggregated series.
+
+    Each entity holds its last value until it changes. A value of None, for a
+    non-numeric state such as ``unavailable``, leaves the entity out until it
+    reports a number again. At every change the aggregate over the entities
+    holding a value is emitted, or nothing if none does. The held values are
+    kept between calls, so a window can be merged chunk by chunk.
+    """
+
+    def __init__(self, aggregate):
+        self._aggregate = aggregate
+        self._values = {}
+
+    def merge(self, series_by_entity):
+        """Merge chronologically ordered samples keyed by entity id."""
+        streams = [
+            [(ts, entity_id, value) for value, ts in series]
+            for entity_id, series in series_by_entity.items()
+        ]
+        merged = []
+        pending = None
+        for ts, entity_id, value in heapq.merge(*streams, key=itemgetter(0)):
+            # Changes at the same moment are emitted together
+            if pending is not None and ts != pending:
+                self._emit(merged, pending)
+            if value is None:
+                self._values.pop(entity_id, None)
+            else:
+                self._values[entity_id] = value
+            pending = ts
+        if pending is not None:
+            self._emit(merged, pending)
+        return merged
+
+    def _emit(self, merged, ts):
+        """Append the aggregate of the values held now, if there are any."""
+        if self._values:
+            values = list(self._values.values())
+            merged.append((aggregate_values(values, self._aggregate), ts))
@@ -0,0 +1,86 @@
+"""Websocket commands serving cached results to frontends."""
+
+import voluptuous as vol
+from homeassistant.components import websocket_api
+from homeassistant.core import callback
+
+from .sensor import DATA_ENTITIES
+
+
+@callback
+def async_register_websocket_commands(hass):
+    """Register the websocket commands of the integration."""
+    websocket_api.async_register_command(hass, websocket_series)
+    websocket_api.async_register_command(hass, websocket_subscribe)
+
+
+def _get_entity(hass, connection, msg):
+    """Return the sensor a command refers to, or send an error."""
+    entity = hass.data.get(DATA_ENTITIES, {}).get(msg["entity_id"])
+    if entity is None:
+        connection.send_error(
+            msg["id"],
+            websocket_api.ERR_NOT_FOUND,
+            f"Historical statistics sensor {msg['entity_id']} not found",
+        )
+    return entity
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "historical_stats/series",
+        vol.Required("entity_id"): str,
+        vol.Optional("label"): str,
+    }
+)
+@callback
+def websocket_series(hass, connection, msg):
+    """Return the downsampled series computed by the last update.
+
+    Points are [unix timestamp, value] pairs keyed by attribute label. No
+    recorder query is made; the series are cached when the sensor updates.
+    """
+    if (entity := _get_entity(hass, connection, msg)) is None:
+        return
+    series = entity.series
+    if (label := msg.get("label")) is not None:
+        series = {label: series[label]} if label in series else {}
+    connection.send_result(msg["id"], {"series": series})
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "historical_stats/subscribe",
+        vol.Required("entity_id"): str,
+    }
+)
+@callback
+def websocket_subscribe(hass, connection, msg):
+    """Stream the results of a sensor as diffs.
+
+    The first event holds all results. Later events, sent after updates that
+    changed something, hold the new state if it changed, the changed
+    attributes under ``changed`` and removed attribute names under
+    ``removed``. Subscribers share the sensor's own update; nothing extra is
+    computed or written to the recorder. When the sensor is removed or
+    reloaded a final ``{"ended": true}`` event is sent and the subscription
+    ends, so clients know to subscribe again.
+    """
+    if (entity := _get_entity(hass, connection, msg)) is None:
+        return
+
+    @callback
+    def forward(diff):
+        if diff is None:
+            connection.subscriptions.pop(msg["id"], None)
+            diff = {"ended": True}
+        connection.send_message(websocket_api.event_message(msg["id"], diff))
+
+    connection.subscriptions[msg["id"]] = entity.async_subscribe(forward)
+    connection.send_result(msg["id"])
+    forward(
+        {
+            "state": entity.native_value,
+            "changed": dict(entity.extra_state_attributes or {}),
+        }
+    )
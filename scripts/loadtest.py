@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""Load test HistoricalStatsSensor against a fake recorder.
+
+Spins up N sensors with a realistic set of measurement points, refreshes
+them all at once at scheduled priority (as when their timers line up) and
+reports how the event loop, the query queue and the recorder cope. While they
+run, one more sensor is updated at user priority, as when an update is
+requested from the UI, to show how long a user waits behind the burst. Run it
+for several sizes to get scaling curves to compare changes against:
+
+    source scripts/dev_init.sh
+    python3 scripts/loadtest.py --entries 10 50 100 200 --latency 20
+
+The recorder is replaced by a stand-in that synthesizes one state every
+``--sample-interval`` seconds over ``--history-days`` of history and sleeps
+``--latency`` milliseconds per query plus ``--row-cost`` microseconds per
+returned row, on a database executor of ``DB_EXECUTOR_WORKERS`` threads like
+the recorder's. Home Assistant itself is replaced by a minimal object that
+only provides what the sensor uses during an update. Recorder reads go
+through the integration's query queue limited to ``--max-concurrency``
+concurrent reads, as configured with ``max_concurrent_queries``.
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "custom_components"))
+
+from historical_stats import queries, query_queue, sensor  # noqa: E402
+from historical_stats.const import DEFAULT_MAX_CONCURRENT_QUERIES  # noqa: E402
+from historical_stats.query_queue import (  # noqa: E402
+    DATA_QUEUE,
+    PRIORITY_SCHEDULED,
+    PRIORITY_USER,
+    QueryQueue,
+)
+
+# Point set resembling a typical configuration
+DEFAULT_POINTS = [
+    {"stat_type": "value_at", "time_unit": "hours", "time_value": 24},
+    {"stat_type": "min", "time_unit": "days", "time_value": 1},
+    {"stat_type": "max", "time_unit": "days", "time_value": 1},
+    {
+        "stat_type": "mean",
+        "time_unit": "weeks",
+        "time_value": 1,
+        "series_points": 100,
+        "series_method": "lttb",
+    },
+    {"stat_type": "max", "time_unit": "months", "time_value": 1},
+    {"stat_type": "min", "time_unit": "all", "time_value": 1},
+]
+
+LAG_PROBE_INTERVAL = 0.05
+
+# Seconds into the burst at which the user requested update starts
+USER_UPDATE_DELAY = 0.1
+
+# Threads of the recorder's database executor
+DB_EXECUTOR_WORKERS = 4
+
+
+class FakeState:
+    """Minimal stand-in for a recorded State."""
+
+    __slots__ = ("state", "last_changed", "attributes")
+
+    def __init__(self, state, last_changed):
+        self.state = state
+        self.last_changed = last_changed
+        self.attributes = {}
+
+
+class FakeRecorder:
+    """Serve synthetic history with configurable latency and count queries."""
+
+    def __init__(self, history_days, sample_interval, latency, row_cost):
+        self.history_start = datetime.now(timezone.utc) - timedelta(days=history_days)
+        self.sample_interval = timedelta(seconds=sample_interval)
+        self.latency = latency / 1000
+        self.row_cost = row_cost / 1_000_000
+        self.calls = 0
+        self.rows = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="Recorder"
+        )
+
+    def async_add_executor_job(self, target, *args):
+        """Run a read on the database executor, as the recorder does."""
+        return asyncio.get_running_loop().run_in_executor(
+            self._executor, target, *args
+        )
+
+    def shutdown(self):
+        """Stop the database executor."""
+        self._executor.shutdown(wait=True)
+
+    def get_significant_states(self, hass, start, end, entity_ids, *args, **kwargs):
+        """Return synthetic states for each entity in the interval."""
+        start = max(start, self.history_start)
+        result = {}
+        rows = 0
+        for entity_id in entity_ids:
+            states = []
+            ts = start
+            while ts < end:
+                # Deterministic wave so min/max have something to find
+                value = 20 + 10 * ((ts.timestamp() // 3600) % 24) / 24
+                states.append(FakeState(str(value), ts))
+                ts += self.sample_interval
+            if states:
+                result[entity_id] = states
+            rows += len(states)
+        time.sleep(self.latency + rows * self.row_cost)
+        with self._lock:
+            self.calls += 1
+            self.rows += rows
+        return result
+
+    def oldest_state_time(self, hass, entity_ids):
+        """Return the start of the synthetic history."""
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return self.history_start
+
+    def statistics_during_period(self, hass, *args, **kwargs):
+        """Report no long-term statistics."""
+        with self._lock:
+            self.calls += 1
+        return {}
+
+
+class FakeHass:
+    """The parts of HomeAssistant a sensor uses while updating."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.data = {}
+
+
+async def _probe(queue, lags, running, pending, stop):
+    """Sample event loop lag and query queue occupancy until stopped."""
+    while not stop.is_set():
+        expected = time.perf_counter() + LAG_PROBE_INTERVAL
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        lags.append(max(0.0, time.perf_counter() - expected))
+        running.append(queue.running)
+        pending.append(queue.pending)
+
+
+async def _timed_refresh(entity, level, delay=0):
+    """Refresh one sensor at a priority level and return how long it took."""
+    await asyncio.sleep(delay)
+    started = time.perf_counter()
+    await entity._async_refresh(level)
+    return time.perf_counter() - started
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+async def run(entries, args):
+    """Refresh ``entries`` sensors concurrently and return the measurements."""
+    recorder = FakeRecorder(
+        args.history_days, args.sample_interval, args.latency, args.row_cost
+    )
+    queries.get_significant_states = recorder.get_significant_states
+    sensor.statistics_during_period = recorder.statistics_during_period
+    sensor.oldest_state_time = recorder.oldest_state_time
+    query_queue.get_instance = lambda hass: recorder
+
+    hass = FakeHass(asyncio.get_running_loop())
+    queue = QueryQueue(hass, args.max_concurrency)
+    hass.data[DATA_QUEUE] = queue
+    entities = [
+        sensor.HistoricalStatsSensor(
+            hass,
+            f"Historical statistics for load test {i}",
+            f"sensor.load_test_{i}",
+            DEFAULT_POINTS,
+            30,
+        )
+        for i in range(entries + 1)
+    ]
+    user_entity = entities.pop()
+
+    lags, running, pending = [], [], []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe(queue, lags, running, pending, stop))
+
+    started = time.perf_counter()
+    user = asyncio.create_task(
+        _timed_refresh(user_entity, PRIORITY_USER, USER_UPDATE_DELAY)
+    )
+    latencies = await asyncio.gather(
+        *(_timed_refresh(e, PRIORITY_SCHEDULED) for e in entities)
+    )
+    elapsed = time.perf_counter() - started
+    user_latency = await user
+
+    stop.set()
+    await probe
+    await queue.async_shutdown()
+    recorder.shutdown()
+
+    errors = sum(
+        1 for e in [*entities, user_entity] if e.native_value == sensor.STATE_ERROR
+    )
+    return {
+        "entries": entries,
+        "total_s": elapsed,
+        "p50_s": _percentile(latencies, 50),
+        "p95_s": _percentile(latencies, 95),
+        "user_s": user_latency,
+        "lag_p95_ms": _percentile(lags, 95) * 1000,
+        "lag_max_ms": max(lags, default=0.0) * 1000,
+        "running_max": max(running, default=0),
+        "pending_max": max(pending, default=0),
+        "calls": recorder.calls,
+        "rows": recorder.rows,
+        "errors": errors,
+    }
+
+
+# Column name, width and number format of the report
+COLUMNS = [
+    ("entries", 7, "d"),
+    ("total_s", 8, ".2f"),
+    ("p50_s", 7, ".2f"),
+    ("p95_s", 7, ".2f"),
+    ("user_s", 7, ".2f"),
+    ("lag_p95_ms", 10, ".1f"),
+    ("lag_max_ms", 10, ".1f"),
+    ("running_max", 11, "d"),
+    ("pending_max", 11, "d"),
+    ("calls", 7, "d"),
+    ("rows", 10, "d"),
+    ("errors", 6, "d"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument(
+        "--max-concurrency", type=int, default=DEFAULT_MAX_CONCURRENT_QUERIES
+    )
+    parser.add_argument("--history-days", type=float, default=90)
+    parser.add_argument(
+        "--sample-interval", type=float, default=300, help="seconds between states"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=10, help="milliseconds per query"
+    )
+    parser.add_argument(
+        "--row-cost", type=float, default=1, help="microseconds per returned row"
+    )
+    args = parser.parse_args()
+
+    print(" ".join(f"{name:>{width}}" for name, width, _ in COLUMNS))
+    for entries in args.entries:
+        result = asyncio.run(run(entries, args))
+        print(" ".join(f"{result[name]:>{width}{fmt}}" for name, width, fmt in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()